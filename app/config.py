@@ -15,17 +15,33 @@ class Settings(BaseSettings):
     VIDEOS_DIR: Path = ROOT_DIR / "data" / "videos"
     FRAMES_DIR: Path = ROOT_DIR / "data" / "frames"
     CHROMA_PERSIST_DIR: Path = ROOT_DIR / "data" / "chromadb"
+    EMBEDDING_CACHE_DIR: Path = ROOT_DIR / "data" / "embeddings"
     
     # Frame extraction settings
     FRAMES_PER_SECOND: float = 1.0  # Extract 1 frame per second
+    USE_PYAV_DECODING: bool = True  # Decode with PyAV when installed, else OpenCV
+    EXTRACTION_WORKERS: int = 0  # Videos processed in parallel (0 = one per GPU, or 4 on CPU)
+    FRAME_WRITER_THREADS: int = 4  # Background threads encoding and writing frame JPEGs
+    DEDUPLICATE_FRAMES: bool = True  # Drop frames that are near-identical to the previous kept frame
+    DEDUP_MAX_HAMMING_DISTANCE: int = 4  # pHash bits that may differ for a frame to count as a duplicate
     
     # Embedding model settings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"  # Lightweight model that works well
     COLLECTION_NAME: str = "ember_frames"
     
+    # Search backend: "chroma" queries ChromaDB directly, "faiss" serves from a
+    # compressed FAISS index built alongside it during indexing (memory-mapped when IVF-PQ)
+    SEARCH_BACKEND: str = "chroma"
+    FAISS_INDEX_PATH: Path = ROOT_DIR / "data" / "faiss" / "frames.index"
+    FAISS_NPROBE: int = 16  # Inverted lists scanned per query on IVF indexes
+    
     # CLIP model settings for generating image descriptions
     USE_CLIP_CAPTIONING: bool = True
-    CLIP_MODEL: str = "ViT-B/32"
+    CLIP_MODEL: str = "ViT-B/32"  # OpenAI CLIP model, used when OpenCLIP is not installed
+    OPEN_CLIP_MODEL: str = "MobileCLIP-S1"  # Smaller OpenCLIP model preferred when installed ("" to disable)
+    OPEN_CLIP_PRETRAINED: str = "datacompdr"
+    CLIP_BATCH_SIZE: int = 32  # Frames encoded per CLIP forward pass
+    CLIP_COMPILE: bool = False  # torch.compile the CLIP image encoder on CUDA (slow first batch)
 
     class Config:
         env_file = ".env"
@@ -38,4 +54,5 @@ settings = Settings()
 # Ensure directories exist
 os.makedirs(settings.VIDEOS_DIR, exist_ok=True)
 os.makedirs(settings.FRAMES_DIR, exist_ok=True)
-os.makedirs(settings.CHROMA_PERSIST_DIR, exist_ok=True)
\ No newline at end of file
+os.makedirs(settings.CHROMA_PERSIST_DIR, exist_ok=True)
+os.makedirs(settings.EMBEDDING_CACHE_DIR, exist_ok=True)
\ No newline at end of file
@@ -1,13 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 import os
 from app.routes import search
+from app.services.search import SearchService
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the search service (and its embedding model) once, before serving requests
+    app.state.search = SearchService()
+    yield
+
 
 app = FastAPI(
     title="Ember Video Frame Search API",
     description="API for semantic search of video frames",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
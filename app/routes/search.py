@@ -1,12 +1,10 @@
 from fastapi import APIRouter, Query, HTTPException, Request
 from typing import Optional
 from app.models.schemas import SearchResponse
-from app.services.search import SearchService
 
 router = APIRouter(prefix="/api", tags=["search"])
-search_service = SearchService()
 
-@router.get("/search", response_model=SearchResponse)
+@router.get("/search", response_model=SearchResponse, response_model_exclude_none=True)
 async def search_frames(
     request: Request,
     query: str = Query(..., description="Search query string"),
@@ -17,13 +15,9 @@ async def search_frames(
     Returns up to 'limit' frames (default 4) that match the query.
     """
     try:
-        # Perform the semantic search
-        results = search_service.search(query, limit)
-        
-        # Convert to absolute URLs
+        # Perform the semantic search, building absolute image URLs as results are created
         base_url = str(request.base_url).rstrip('/')
-        for result in results:
-            result.image_url = f"{base_url}/frames/{result.image_url}"
+        results = request.app.state.search.search(query, limit, base_url)
         
         # Return formatted response
         return SearchResponse(
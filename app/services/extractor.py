@@ -1,21 +1,93 @@
 import os
 import cv2
-import json
+import math
+import orjson
+import multiprocessing
+import threading
 import uuid
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 
 from app.config import settings
+from app.services.metadata_store import FrameMetadataStore
 
 try:
     # Try to import CLIP for automatic captioning
     import torch
-    import clip
     from PIL import Image
     CLIP_AVAILABLE = True
 except ImportError:
     CLIP_AVAILABLE = False
 
+try:
+    # Prefer OpenCLIP, which provides smaller models such as MobileCLIP
+    import open_clip
+    OPEN_CLIP_AVAILABLE = CLIP_AVAILABLE
+except ImportError:
+    OPEN_CLIP_AVAILABLE = False
+
+try:
+    # Folds MobileCLIP's multi-branch training blocks into single convolutions
+    from timm.utils import reparameterize_model
+except ImportError:
+    reparameterize_model = None
+
+try:
+    # Fall back to OpenAI's reference CLIP package
+    import clip
+    OPENAI_CLIP_AVAILABLE = CLIP_AVAILABLE
+except ImportError:
+    OPENAI_CLIP_AVAILABLE = False
+
+CLIP_AVAILABLE = OPEN_CLIP_AVAILABLE or OPENAI_CLIP_AVAILABLE
+
+try:
+    # Try to import PyAV for filter-based frame decoding
+    import av
+    AV_AVAILABLE = True
+except ImportError:
+    AV_AVAILABLE = False
+
+
+# Default pool size when no GPU is used
+DEFAULT_CPU_WORKERS = 4
+
+
+class _FrameWriter:
+    """Encode and write frame JPEGs on background threads, bounding how many are in flight"""
+    
+    def __init__(self, max_workers: int, max_pending: int = 64):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="frame-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = []
+    
+    def __enter__(self) -> "_FrameWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._executor.shutdown(wait=True)
+        if exc_type is None:
+            # Surface the first write error, if any
+            for future in self._futures:
+                future.result()
+    
+    def submit(self, frame_path: str, frame: np.ndarray) -> None:
+        """Queue a frame to be written, blocking while max_pending writes are outstanding"""
+        self._slots.acquire()
+        future = self._executor.submit(self._write, frame_path, frame)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+    
+    @staticmethod
+    def _write(frame_path: str, frame: np.ndarray) -> None:
+        ok, buffer = cv2.imencode(".jpg", frame)
+        if not ok:
+            raise ValueError(f"Could not encode frame: {frame_path}")
+        with open(frame_path, "wb") as f:
+            f.write(buffer)
+
 
 class FrameExtractor:
     def __init__(self, videos_dir: Path = None, frames_dir: Path = None, ember_only: bool = False):
@@ -30,22 +102,67 @@ class FrameExtractor:
         self.videos_dir = videos_dir or settings.VIDEOS_DIR
         self.frames_dir = frames_dir or settings.FRAMES_DIR
         self.ember_only = ember_only
+        self.candidate_labels = self._get_candidate_labels()
         
         # Ensure directories exist
         os.makedirs(self.videos_dir, exist_ok=True)
         os.makedirs(self.frames_dir, exist_ok=True)
         
-        # Set up CLIP model if available and enabled
+        # CLIP is loaded on first use so that pool workers, not the parent, hold the model
         self.clip_model = None
         self.clip_preprocess = None
+        self.text_features = None
+        self._clip_load_attempted = False
+        
+        # CPU threads this extractor may use for decoding and JPEG writes (None = no limit);
+        # pool workers set this to their share of the cores
+        self.cpu_threads = None
+    
+    def _load_clip_model(self) -> None:
+        """Set up the CLIP model if available and enabled"""
+        if self._clip_load_attempted:
+            return
+        self._clip_load_attempted = True
         
         if CLIP_AVAILABLE and settings.USE_CLIP_CAPTIONING:
             try:
                 self.device = "cuda" if torch.cuda.is_available() else "cpu"
-                self.clip_model, self.clip_preprocess = clip.load(settings.CLIP_MODEL, device=self.device)
-                print(f"CLIP model loaded for automatic captioning (using {self.device})")
+                if OPEN_CLIP_AVAILABLE and settings.OPEN_CLIP_MODEL:
+                    model_name = f"{settings.OPEN_CLIP_MODEL} ({settings.OPEN_CLIP_PRETRAINED})"
+                    self.clip_model, _, self.clip_preprocess = open_clip.create_model_and_transforms(
+                        settings.OPEN_CLIP_MODEL,
+                        pretrained=settings.OPEN_CLIP_PRETRAINED,
+                        device=self.device
+                    )
+                    self.clip_model.eval()
+                    if reparameterize_model is not None:
+                        self.clip_model = reparameterize_model(self.clip_model)
+                    tokenize = open_clip.get_tokenizer(settings.OPEN_CLIP_MODEL)
+                else:
+                    model_name = settings.CLIP_MODEL
+                    self.clip_model, self.clip_preprocess = clip.load(settings.CLIP_MODEL, device=self.device)
+                    tokenize = clip.tokenize
+                
+                # Run CLIP in half precision on GPU; CPU kernels stay in FP32
+                self.clip_dtype = torch.float16 if self.device == "cuda" else torch.float32
+                self.clip_model = self.clip_model.to(dtype=self.clip_dtype)
+                
+                if self.device == "cuda":
+                    # NHWC layout for the image encoder's patch-embedding convolution
+                    self.clip_model = self.clip_model.to(memory_format=torch.channels_last)
+                    if settings.CLIP_COMPILE:
+                        # Only the image encoder runs per batch; the labels are encoded once
+                        self.clip_model.visual = torch.compile(self.clip_model.visual, mode="reduce-overhead")
+
+                # Encode the candidate labels once; they are the same for every frame
+                text = tokenize(self.candidate_labels).to(self.device)
+                with torch.no_grad():
+                    text_features = self.clip_model.encode_text(text)
+                self.text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+                print(f"CLIP model {model_name} loaded for automatic captioning (using {self.device})")
             except Exception as e:
                 print(f"Failed to load CLIP model: {e}")
+                self.clip_model = None
     
     def _get_candidate_labels(self) -> List[str]:
         """Get the appropriate set of candidate labels based on mode"""
@@ -126,63 +243,51 @@ class FrameExtractor:
         """
         fps = frames_per_second or settings.FRAMES_PER_SECOND
         video_filename = os.path.basename(video_path)
-        
-        # Open video file
-        cap = cv2.VideoCapture(str(video_path))
-        if not cap.isOpened():
-            raise ValueError(f"Could not open video file: {video_path}")
-        
-        # Get video properties
-        video_fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        # Calculate frame interval
-        frame_interval = int(video_fps / fps)
-        if frame_interval < 1:
-            frame_interval = 1
-        
-        # Limit total frames if specified
-        if max_frames:
-            frames_to_extract = min(total_frames, max_frames * frame_interval)
-        else:
-            frames_to_extract = total_frames
+        self._load_clip_model()
         
         # Extract frames
         frame_metadata = []
-        frame_count = 0
+        pending = []
         processed_count = 0
+        last_hash = None
         
-        while frame_count < frames_to_extract:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Process frame at specified interval
-            if frame_count % frame_interval == 0:
-                # Generate unique ID for frame
-                frame_id = str(uuid.uuid4())
+        writer_threads = min(settings.FRAME_WRITER_THREADS, self.cpu_threads or settings.FRAME_WRITER_THREADS)
+        with _FrameWriter(max_workers=writer_threads) as writer:
+            for frame_number, timestamp, frame in self._iter_frames(video_path, fps, max_frames):
+                # Skip frames that look the same as the last kept frame (static scenes)
+                if settings.DEDUPLICATE_FRAMES:
+                    frame_hash = self._perceptual_hash(frame)
+                    if last_hash is not None and (frame_hash ^ last_hash).bit_count() <= settings.DEDUP_MAX_HAMMING_DISTANCE:
+                        continue
+                    last_hash = frame_hash
+                
+                # Derive a stable ID for the frame so re-extraction reuses the same IDs
+                frame_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{video_filename}#{frame_number}"))
                 
                 # Create frame filename
                 frame_filename = f"{os.path.splitext(video_filename)[0]}_frame_{processed_count:05d}.jpg"
                 frame_path = os.path.join(self.frames_dir, frame_filename)
                 
-                # Save frame
-                cv2.imwrite(frame_path, frame)
+                # Save frame without blocking decode or CLIP on disk I/O
+                writer.submit(frame_path, frame)
                 
                 # Create metadata for frame
                 metadata = {
                     "id": frame_id,
                     "filename": frame_filename,
                     "video_filename": video_filename,
-                    "frame_number": frame_count,
-                    "timestamp": frame_count / video_fps
+                    "frame_number": frame_number,
+                    "timestamp": timestamp
                 }
                 
-                # Generate description with CLIP if available
-                if self.clip_model is not None:
-                    description = self._generate_frame_description(frame_path)
-                    if description:
-                        metadata["description"] = description
+                # Queue the preprocessed frame for batched description with CLIP if available;
+                # only the small input tensor is held, not the full-resolution frame
+                image = self._preprocess_frame(frame) if self.clip_model is not None else None
+                if image is not None:
+                    pending.append((image, metadata))
+                    if len(pending) >= settings.CLIP_BATCH_SIZE:
+                        self._describe_pending(pending)
+                        pending = []
                 
                 frame_metadata.append(metadata)
                 processed_count += 1
@@ -191,48 +296,211 @@ class FrameExtractor:
                 if max_frames and processed_count >= max_frames:
                     break
             
-            frame_count += 1
-        
-        # Release video capture
-        cap.release()
+        # Describe any frames left over from the last partial batch
+        if pending:
+            self._describe_pending(pending)
         
         return frame_metadata
     
-    def _generate_frame_description(self, frame_path: str) -> Optional[str]:
-        """Generate a textual description of the frame using CLIP"""
+    @staticmethod
+    def _perceptual_hash(frame: np.ndarray) -> int:
+        """Compute a 64-bit DCT perceptual hash (pHash) of a BGR frame"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+        
+        # Keep the lowest 8x8 frequencies and compare each against their median
+        low_freq = cv2.dct(small)[:8, :8]
+        bits = (low_freq > np.median(low_freq)).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+    
+    def _iter_frames(
+        self,
+        video_path: Path,
+        fps: float,
+        max_frames: int = None
+    ) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Yield (frame_number, timestamp, BGR frame) for each frame to extract"""
+        if AV_AVAILABLE and settings.USE_PYAV_DECODING:
+            return self._iter_frames_pyav(video_path, fps)
+        return self._iter_frames_opencv(video_path, fps, max_frames)
+    
+    def _iter_frames_pyav(self, video_path: Path, fps: float) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Decode with PyAV, converting to BGR only the frames kept at the target rate"""
+        try:
+            container = av.open(str(video_path))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Could not open video file: {video_path}") from e
+        
+        with container:
+            if not container.streams.video:
+                raise ValueError(f"No video stream found in: {video_path}")
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            if self.cpu_threads:
+                stream.thread_count = self.cpu_threads
+            video_fps = float(stream.average_rate or stream.guessed_rate or fps)
+            start_pts = stream.start_time or 0
+            
+            # Keep the first frame at or after each 1/fps sample point. Each decoded frame is
+            # kept at most once, so a target rate above the source rate never duplicates frames
+            sample_interval = 1.0 / fps
+            next_sample = 0.0
+            for frame_number, frame in enumerate(container.decode(stream)):
+                # Presentation time relative to the stream start (handles VFR and non-zero starts)
+                if frame.pts is not None and stream.time_base is not None:
+                    timestamp = float((frame.pts - start_pts) * stream.time_base)
+                else:
+                    timestamp = frame_number / video_fps
+                
+                if timestamp < next_sample - 1e-6:
+                    continue
+                
+                yield frame_number, timestamp, frame.to_ndarray(format="bgr24")
+                next_sample = (math.floor(timestamp / sample_interval + 1e-6) + 1) * sample_interval
+    
+    def _iter_frames_opencv(
+        self,
+        video_path: Path,
+        fps: float,
+        max_frames: int = None
+    ) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Walk the video with OpenCV, converting only every frame_interval-th frame"""
+        # Open video file
+        cap = cv2.VideoCapture(str(video_path))
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+        
         try:
-            # Load and preprocess the image
-            image = self.clip_preprocess(Image.open(frame_path)).unsqueeze(0).to(self.device)
+            # Get video properties
+            video_fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            
+            # Calculate frame interval
+            frame_interval = int(video_fps / fps)
+            if frame_interval < 1:
+                frame_interval = 1
             
-            # Get appropriate candidate labels based on mode
-            candidate_labels = self._get_candidate_labels()
+            # Limit total frames if specified
+            if max_frames:
+                frames_to_extract = min(total_frames, max_frames * frame_interval)
+            else:
+                frames_to_extract = total_frames
             
-            # Encode the candidate labels
-            text = clip.tokenize(candidate_labels).to(self.device)
+            frame_count = 0
+            while frame_count < frames_to_extract:
+                # grab() advances without colour conversion; skipped frames never pay for it
+                if not cap.grab():
+                    break
+                
+                # Process frame at specified interval
+                if frame_count % frame_interval == 0:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    yield frame_count, frame_count / video_fps, frame
+                
+                frame_count += 1
+        finally:
+            # Release video capture
+            cap.release()
+    
+    def _preprocess_frame(self, frame: np.ndarray) -> Optional["torch.Tensor"]:
+        """Turn a decoded BGR frame into a CLIP input tensor without a disk round trip"""
+        try:
+            return self.clip_preprocess(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+        except Exception as e:
+            print(f"Error preprocessing frame for CLIP: {e}")
+            return None
+    
+    def _describe_pending(self, pending: List[Tuple["torch.Tensor", Dict]]) -> None:
+        """Attach CLIP descriptions to a batch of (preprocessed image, metadata) pairs"""
+        descriptions = self._describe_batch([image for image, _ in pending])
+        for (_, metadata), description in zip(pending, descriptions):
+            if description:
+                metadata["description"] = description
+    
+    def _describe_batch(self, tensors: List["torch.Tensor"]) -> List[Optional[str]]:
+        """Generate textual descriptions for a batch of preprocessed frames using CLIP"""
+        try:
+            if self.device == "cuda":
+                # Stack straight into page-locked memory so the copy to the GPU is asynchronous
+                images = torch.empty((len(tensors), *tensors[0].shape), pin_memory=True)
+                torch.stack(tensors, out=images)
+                images = images.to(
+                    self.device,
+                    dtype=self.clip_dtype,
+                    non_blocking=True,
+                    memory_format=torch.channels_last
+                )
+            else:
+                images = torch.stack(tensors).to(self.device, dtype=self.clip_dtype)
             
-            # Compute similarity between image and text
+            # Compute similarity between images and the cached label features
             with torch.no_grad():
-                image_features = self.clip_model.encode_image(image)
-                text_features = self.clip_model.encode_text(text)
+                image_features = self.clip_model.encode_image(images)
                 
                 # Normalize features
                 image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
                 
                 # Compute similarity
-                similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1)
+                similarity = (100.0 * image_features @ self.text_features.T).float().softmax(dim=-1)
             
-            # Get top matching labels
-            values, indices = similarity[0].topk(3)
+            # Get top matching labels for each frame
+            values, indices = similarity.topk(3, dim=-1)
             
             # Combine top labels into a description
-            top_labels = [candidate_labels[idx] for idx in indices]
-            description = ", ".join(top_labels)
-            
-            return description
+            return [
+                ", ".join(self.candidate_labels[idx] for idx in frame_indices)
+                for frame_indices in indices.tolist()
+            ]
         except Exception as e:
-            print(f"Error generating frame description: {e}")
-            return None
+            print(f"Error generating frame descriptions: {e}")
+            return [None] * len(tensors)
+    
+    def _extract_all(self, video_files: List[Path]) -> Iterator[List[Dict]]:
+        """Extract frames from each video, fanning out across a process pool when possible"""
+        use_clip = CLIP_AVAILABLE and settings.USE_CLIP_CAPTIONING
+        gpu_count = torch.cuda.device_count() if use_clip else 0
+        
+        workers = settings.EXTRACTION_WORKERS
+        if not workers:
+            # One worker per GPU so each card holds a single CLIP copy; on CPU a few workers
+            # already saturate the cores once decode, CLIP and JPEG threads are counted
+            workers = gpu_count or min(DEFAULT_CPU_WORKERS, os.cpu_count() or 1)
+        workers = min(workers, len(video_files))
+        if workers <= 1:
+            for video_path in video_files:
+                print(f"Processing video: {video_path}")
+                yield self.extract_frames_from_video(video_path)
+            return
+        
+        # Spawn rather than fork so each worker gets a clean CUDA context
+        ctx = multiprocessing.get_context("spawn")
+        
+        # Hand out GPUs round-robin so each worker pins its CLIP model to one device;
+        # reuse the parent's CUDA_VISIBLE_DEVICES entries so restricted jobs stay on their GPUs
+        gpu_queue = None
+        if gpu_count > 0:
+            visible_devices = [
+                device.strip()
+                for device in os.environ.get("CUDA_VISIBLE_DEVICES", "").split(",")
+                if device.strip()
+            ]
+            devices = visible_devices[:gpu_count] or [str(i) for i in range(gpu_count)]
+            gpu_queue = ctx.Queue()
+            for worker_index in range(workers):
+                gpu_queue.put(devices[worker_index % len(devices)])
+        
+        print(f"Processing videos with {workers} worker processes")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.videos_dir, self.frames_dir, self.ember_only, workers, gpu_queue)
+        ) as executor:
+            for video_path, frame_metadata in zip(video_files, executor.map(_extract_in_worker, video_files)):
+                print(f"Processed video: {video_path} ({len(frame_metadata)} frames)")
+                yield frame_metadata
     
     def process_all_videos(self) -> Dict[str, Dict]:
         """
@@ -253,18 +521,44 @@ class FrameExtractor:
         
         # Process each video
         all_metadata = {}
-        for video_path in video_files:
-            print(f"Processing video: {video_path}")
-            frame_metadata = self.extract_frames_from_video(video_path)
-            
+        for frame_metadata in self._extract_all(video_files):
             # Add to metadata dictionary
             for metadata in frame_metadata:
                 all_metadata[metadata["id"]] = metadata
         
         # Save metadata to file
         metadata_path = os.path.join(self.frames_dir, "metadata.json")
-        with open(metadata_path, 'w') as f:
-            json.dump(all_metadata, f, indent=2)
+        with open(metadata_path, 'wb') as f:
+            f.write(orjson.dumps(all_metadata, option=orjson.OPT_INDENT_2))
+        
+        # Save metadata to SQLite for per-frame lookups by the search API
+        FrameMetadataStore(os.path.join(self.frames_dir, "frames.db")).write(all_metadata)
         
         print(f"Processed {len(all_metadata)} frames from {len(video_files)} videos")
-        return all_metadata
\ No newline at end of file
+        return all_metadata
+
+
+# Per-process extractor used by process pool workers
+_worker_extractor: Optional[FrameExtractor] = None
+
+
+def _init_worker(videos_dir: Path, frames_dir: Path, ember_only: bool, workers: int, gpu_queue) -> None:
+    """Create the extractor for a pool worker, pinning it to a GPU when one is assigned"""
+    global _worker_extractor
+    if gpu_queue is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = gpu_queue.get()
+    
+    # Split the CPU between workers instead of letting each use every core
+    cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    if CLIP_AVAILABLE:
+        torch.set_num_threads(cpu_threads)
+    cv2.setNumThreads(cpu_threads)
+    
+    _worker_extractor = FrameExtractor(videos_dir=videos_dir, frames_dir=frames_dir, ember_only=ember_only)
+    _worker_extractor.cpu_threads = cpu_threads
+
+
+def _extract_in_worker(video_path: Path) -> List[Dict]:
+    """Extract frames from a single video inside a pool worker"""
+    print(f"Processing video: {video_path}")
+    return _worker_extractor.extract_frames_from_video(video_path)
\ No newline at end of file
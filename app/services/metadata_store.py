@@ -0,0 +1,89 @@
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, List
+
+from app.config import settings
+
+FRAME_COLUMNS = ("id", "filename", "video_filename", "frame_number", "timestamp", "description")
+
+
+class FrameMetadataStore:
+    def __init__(self, db_path: Path = None):
+        """
+        SQLite-backed frame metadata, looked up by frame ID on demand
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path or os.path.join(settings.FRAMES_DIR, "frames.db"))
+        self._connection = None
+
+    def exists(self) -> bool:
+        return self.db_path.exists()
+
+    def write(self, all_metadata: Dict[str, Dict]) -> None:
+        """
+        Replace the database with the given frame metadata
+
+        The database is built next to the target and swapped in atomically,
+        so a running API never sees a half-written file.
+
+        Args:
+            all_metadata: Dictionary mapping frame IDs to frame metadata
+        """
+        tmp_path = self.db_path.with_suffix(".db.tmp")
+        if tmp_path.exists():
+            os.unlink(tmp_path)
+
+        connection = sqlite3.connect(str(tmp_path))
+        try:
+            connection.execute(
+                "CREATE TABLE frames ("
+                "id TEXT PRIMARY KEY, filename TEXT NOT NULL, video_filename TEXT NOT NULL, "
+                "frame_number INTEGER NOT NULL, timestamp REAL, description TEXT)"
+            )
+            connection.executemany(
+                f"INSERT INTO frames ({', '.join(FRAME_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        frame_id,
+                        metadata["filename"],
+                        metadata["video_filename"],
+                        metadata["frame_number"],
+                        metadata.get("timestamp"),
+                        metadata.get("description"),
+                    )
+                    for frame_id, metadata in all_metadata.items()
+                ),
+            )
+            connection.commit()
+        finally:
+            connection.close()
+
+        os.replace(tmp_path, self.db_path)
+
+    def get_many(self, frame_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Look up metadata for a handful of frames
+
+        Args:
+            frame_ids: Frame IDs to fetch
+
+        Returns:
+            Dictionary mapping each found frame ID to its metadata
+        """
+        if not frame_ids:
+            return {}
+
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+            )
+
+        placeholders = ", ".join("?" for _ in frame_ids)
+        rows = self._connection.execute(
+            f"SELECT {', '.join(FRAME_COLUMNS)} FROM frames WHERE id IN ({placeholders})",
+            list(frame_ids),
+        )
+        return {row[0]: dict(zip(FRAME_COLUMNS, row)) for row in rows}
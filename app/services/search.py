@@ -1,13 +1,16 @@
 import os
-import json
+import orjson
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
-from typing import List
+from pathlib import Path
+from typing import List, Tuple
 import numpy as np
 
 from app.models.schemas import FrameResponse
 from app.config import settings
+from app.services.metadata_store import FrameMetadataStore
+from app.services.vector_index import FaissFrameIndex
 
 class SearchService:
     def __init__(self):
@@ -19,56 +22,79 @@ class SearchService:
             model_name=settings.EMBEDDING_MODEL
         )
         
+        # Run one dummy query so the first real request doesn't pay for model warm-up
+        self.embedding_function(["warmup"])
+        
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
             name=settings.COLLECTION_NAME,
             embedding_function=self.embedding_function
         )
         
-        # Load frame metadata
+        # Serve from the compressed FAISS index instead of ChromaDB if configured
+        self.faiss_index = None
+        if settings.SEARCH_BACKEND == "faiss":
+            self.faiss_index = FaissFrameIndex.load()
+        
+        # Look frame metadata up in SQLite per request; fall back to loading
+        # metadata.json into memory for data extracted before frames.db existed
+        self.metadata_store = FrameMetadataStore()
         self.frame_metadata = {}
-        metadata_path = os.path.join(settings.FRAMES_DIR, "metadata.json")
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                self.frame_metadata = json.load(f)
+        if not self.metadata_store.exists():
+            self.metadata_store = None
+            metadata_path = os.path.join(settings.FRAMES_DIR, "metadata.json")
+            if os.path.exists(metadata_path):
+                self.frame_metadata = orjson.loads(Path(metadata_path).read_bytes())
     
-    def search(self, query: str, limit: int = 4) -> List[FrameResponse]:
+    def search(self, query: str, limit: int = 4, base_url: str = "") -> List[FrameResponse]:
         """
         Perform semantic search on video frames
         
         Args:
             query: The search query string
             limit: Maximum number of results to return
+            base_url: Server URL prefixed to each frame's image URL
             
         Returns:
             List of FrameResponse objects containing matching frames
         """
-        # Query the collection
+        if self.faiss_index is not None:
+            query_embedding = np.asarray(self.embedding_function([query])[0], dtype=np.float32)
+            frame_ids, similarities = self.faiss_index.search(query_embedding, limit)
+        else:
+            frame_ids, similarities = self._query_collection(query, limit)
+        
+        # Fetch metadata for just the matched frames
+        if self.metadata_store is not None:
+            frame_metadata = self.metadata_store.get_many(frame_ids)
+        else:
+            frame_metadata = self.frame_metadata
+        
+        # Build responses for the frames we have metadata for
+        return [
+            FrameResponse(
+                image_url=f"{base_url}/frames/{metadata['filename']}",
+                video_filename=metadata["video_filename"],
+                frame_number=metadata["frame_number"],
+                similarity_score=similarity
+            )
+            for frame_id, similarity in zip(frame_ids, similarities)
+            if (metadata := frame_metadata.get(frame_id)) is not None
+        ]
+    
+    def _query_collection(self, query: str, limit: int) -> Tuple[List[str], List[float]]:
+        """Query ChromaDB, returning frame IDs and similarity scores"""
         results = self.collection.query(
             query_texts=[query],
             n_results=limit
         )
         
-        # Process results
-        frame_results = []
-        if results and len(results['ids'][0]) > 0:
-            for i, frame_id in enumerate(results['ids'][0]):
-                # Get metadata for the frame
-                if frame_id in self.frame_metadata:
-                    metadata = self.frame_metadata[frame_id]
-                    
-                    # Calculate similarity score (normalized between 0-1)
-                    similarity = float(results['distances'][0][i])
-                    if similarity > 1.0:  # Convert distance to similarity if needed
-                        similarity = 1.0 - min(similarity, 2.0) / 2.0
-                    
-                    frame_results.append(
-                        FrameResponse(
-                            image_url=metadata["filename"],
-                            video_filename=metadata["video_filename"],
-                            frame_number=metadata["frame_number"],
-                            similarity_score=similarity
-                        )
-                    )
+        if not results or len(results['ids'][0]) == 0:
+            return [], []
+        
+        # Calculate similarity scores (normalized between 0-1), converting
+        # distances to similarity where needed
+        distances = np.asarray(results['distances'][0], dtype=np.float64)
+        similarities = np.where(distances > 1.0, 1.0 - np.minimum(distances, 2.0) / 2.0, distances)
         
-        return frame_results
\ No newline at end of file
+        return results['ids'][0], similarities.tolist()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import os
+import math
+import sqlite3
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+try:
+    # FAISS is only needed for the compressed "faiss" search backend
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# Product quantization trains 256-entry codebooks and needs ~39 vectors per entry
+PQ_MIN_VECTORS = 256 * 39
+
+
+class FaissFrameIndex:
+    def __init__(self, index, frame_ids: List[str] = None, ids_path: Path = None):
+        """
+        Compressed FAISS index over frame embeddings
+
+        Args:
+            index: FAISS index whose row numbers line up with frame_ids
+            frame_ids: Frame ID for each row in the index, held in memory after build()
+            ids_path: SQLite file mapping rows to frame IDs, queried per search after load()
+        """
+        self.index = index
+        self.frame_ids = frame_ids
+        self.ids_path = ids_path
+        self._connection = None
+
+    @staticmethod
+    def _factory_string(num_vectors: int, dim: int) -> str:
+        """Pick an index layout for the corpus size"""
+        if num_vectors >= PQ_MIN_VECTORS and dim % 8 == 0:
+            # Inverted lists with 8-dim PQ sub-vectors: one byte per 8 floats (32x smaller)
+            nlist = min(4096, int(math.sqrt(num_vectors)))
+            return f"IVF{nlist},PQ{dim // 8}"
+
+        # Too few vectors to train PQ codebooks; int8 scalar quantization (4x smaller)
+        return "SQ8"
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, frame_ids: List[str]) -> "FaissFrameIndex":
+        """
+        Train and fill a quantized index from frame embeddings
+
+        Args:
+            embeddings: Array of shape (len(frame_ids), dim)
+            frame_ids: Frame ID for each embedding row
+
+        Returns:
+            FaissFrameIndex ready to be saved or searched
+        """
+        if not FAISS_AVAILABLE:
+            raise RuntimeError("faiss is not installed; install faiss-cpu to use the faiss search backend")
+
+        # Normalize so inner product is cosine similarity
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32).copy()
+        faiss.normalize_L2(vectors)
+
+        num_vectors, dim = vectors.shape
+        index = faiss.index_factory(dim, cls._factory_string(num_vectors, dim), faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.add(vectors)
+
+        return cls(index, list(frame_ids))
+
+    @staticmethod
+    def _ids_path(index_path: Path) -> Path:
+        return Path(index_path).with_suffix(".ids.db")
+
+    def save(self, index_path: Path = None) -> None:
+        """Write the index and its row-to-frame-ID table to disk"""
+        index_path = Path(index_path or settings.FAISS_INDEX_PATH)
+        os.makedirs(index_path.parent, exist_ok=True)
+
+        faiss.write_index(self.index, str(index_path))
+
+        # Built next to the target and swapped in, like the frame metadata database
+        ids_path = self._ids_path(index_path)
+        tmp_path = ids_path.with_suffix(".db.tmp")
+        if tmp_path.exists():
+            os.unlink(tmp_path)
+
+        connection = sqlite3.connect(str(tmp_path))
+        try:
+            connection.execute("CREATE TABLE faiss_rows (row INTEGER PRIMARY KEY, frame_id TEXT NOT NULL)")
+            connection.executemany("INSERT INTO faiss_rows (row, frame_id) VALUES (?, ?)", enumerate(self.frame_ids))
+            connection.commit()
+        finally:
+            connection.close()
+
+        os.replace(tmp_path, ids_path)
+
+    @classmethod
+    def load(cls, index_path: Path = None) -> "FaissFrameIndex":
+        """
+        Open an index from disk for searching
+
+        IVF-PQ indexes are memory-mapped, so their inverted lists are paged in on
+        demand; FAISS cannot map other layouts, so small SQ8 indexes are read into RAM.
+        Frame IDs stay on disk and are looked up only for the rows a search returns.
+        """
+        if not FAISS_AVAILABLE:
+            raise RuntimeError("faiss is not installed; install faiss-cpu to use the faiss search backend")
+
+        index_path = Path(index_path or settings.FAISS_INDEX_PATH)
+        index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP)
+        try:
+            faiss.extract_index_ivf(index).nprobe = settings.FAISS_NPROBE
+        except RuntimeError:
+            pass  # Not an IVF index; nothing to tune
+
+        return cls(index, ids_path=cls._ids_path(index_path))
+
+    def _lookup_frame_ids(self, rows: List[int]) -> List[str]:
+        """Map index rows to frame IDs, in the order given"""
+        if self.frame_ids is not None:
+            return [self.frame_ids[row] for row in rows]
+
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                f"{Path(self.ids_path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+            )
+
+        placeholders = ", ".join("?" for _ in rows)
+        frame_ids = dict(
+            self._connection.execute(
+                f"SELECT row, frame_id FROM faiss_rows WHERE row IN ({placeholders})", rows
+            )
+        )
+        return [frame_ids[row] for row in rows]
+
+    def search(self, query_embedding: np.ndarray, limit: int) -> Tuple[List[str], List[float]]:
+        """
+        Find the frames closest to a query embedding
+
+        Args:
+            query_embedding: Embedding of the query text
+            limit: Maximum number of results to return
+
+        Returns:
+            Tuple of (frame IDs, cosine similarities), best match first
+        """
+        query = np.ascontiguousarray(query_embedding, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(query)
+
+        scores, rows = self.index.search(query, limit)
+
+        # FAISS pads with -1 when fewer than `limit` vectors are available
+        hits = [(int(row), float(score)) for score, row in zip(scores[0], rows[0]) if row >= 0]
+        if not hits:
+            return [], []
+
+        frame_ids = self._lookup_frame_ids([row for row, _ in hits])
+        similarities = [score for _, score in hits]
+        return frame_ids, similarities
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 import os
 from app.routes import search
@@ -7,7 +8,8 @@ from app.routes import search
 app = FastAPI(
     title="Ember Video Frame Search API",
     description="API for semantic search of video frames",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -6,7 +6,7 @@ from app.services.search import SearchService
 router = APIRouter(prefix="/api", tags=["search"])
 search_service = SearchService()
 
-@router.get("/search", response_model=SearchResponse)
+@router.get("/search", response_model=SearchResponse, response_model_exclude_none=True)
 async def search_frames(
     request: Request,
     query: str = Query(..., description="Search query string"),
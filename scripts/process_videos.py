@@ -4,18 +4,21 @@ Script to extract frames from videos and index them in ChromaDB
 """
 import os
 import sys
-import json
+import orjson
+import hashlib
 import argparse
 from pathlib import Path
+import numpy as np
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
-from tqdm import tqdm
+import torch
 
 # Add project root to path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from app.services.extractor import FrameExtractor
+from app.services.vector_index import FaissFrameIndex
 from app.config import settings
 
 
@@ -25,6 +28,74 @@ def process_videos(args):
     return extractor.process_all_videos()
 
 
+def embed_documents(documents, model):
+    """
+    Embed documents with the sentence-transformer model, caching vectors on disk
+    
+    Vectors are keyed by the SHA-1 of the document text, so re-indexing only
+    encodes documents that are new or have changed since the last run. Keys and
+    vectors live in one .npz that is replaced atomically, so they cannot go out
+    of step if a run is interrupted.
+    
+    Args:
+        documents: List of document strings to embed
+        model: SentenceTransformer used to encode documents missing from the cache
+        
+    Returns:
+        float32 array of shape (len(documents), embedding_dim)
+    """
+    cache_name = settings.EMBEDDING_MODEL.replace("/", "_")
+    cache_path = settings.EMBEDDING_CACHE_DIR / f"{cache_name}.npz"
+    
+    # Load previously computed embeddings
+    cached_vectors = None
+    key_index = {}
+    if cache_path.exists():
+        with np.load(cache_path) as cache:
+            cached_keys = cache["keys"].tolist()
+            cached_vectors = cache["vectors"]
+        if len(cached_keys) == len(cached_vectors):
+            key_index = {key: row for row, key in enumerate(cached_keys)}
+        else:
+            print(f"Ignoring inconsistent embedding cache: {cache_path}")
+            cached_vectors = None
+    
+    keys = [hashlib.sha1(document.encode("utf-8")).hexdigest() for document in documents]
+    
+    # Encode only documents that are not in the cache
+    missing = {}
+    for key, document in zip(keys, documents):
+        if key not in key_index and key not in missing:
+            missing[key] = document
+    
+    if missing:
+        print(f"Encoding {len(missing)} new documents ({len(key_index)} cached)")
+        new_vectors = model.encode(
+            list(missing.values()),
+            batch_size=256,
+            convert_to_numpy=True,
+            show_progress_bar=True
+        ).astype(np.float32)
+        
+        offset = 0 if cached_vectors is None else len(cached_vectors)
+        for row, key in enumerate(missing):
+            key_index[key] = offset + row
+        cached_vectors = new_vectors if cached_vectors is None else np.concatenate([cached_vectors, new_vectors])
+    else:
+        print(f"Reusing cached embeddings for all {len(documents)} documents")
+    
+    embeddings = cached_vectors[[key_index[key] for key in keys]]
+    
+    # Rewrite the cache with only the current documents so it does not grow without bound
+    unique_keys = list(dict.fromkeys(keys))
+    tmp_path = cache_path.with_suffix(".npz.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, keys=np.array(unique_keys), vectors=cached_vectors[[key_index[key] for key in unique_keys]])
+    os.replace(tmp_path, cache_path)
+    
+    return embeddings
+
+
 def index_frames(metadata, args):
     """Index frames in ChromaDB"""
     print("Indexing frames in ChromaDB...")
@@ -32,10 +103,13 @@ def index_frames(metadata, args):
     # Initialize ChromaDB client with new configuration
     client = chromadb.PersistentClient(path=str(settings.CHROMA_PERSIST_DIR))
     
-    # Use sentence-transformers for embedding
+    # Use sentence-transformers for embedding; the collection's embedding function
+    # and the document encoder share the one model it loads
     embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=settings.EMBEDDING_MODEL
+        model_name=settings.EMBEDDING_MODEL,
+        device="cuda" if torch.cuda.is_available() else "cpu"
     )
+    model = embedding_function._model
     
     # Create or get collection
     if args.recreate:
@@ -51,68 +125,77 @@ def index_frames(metadata, args):
     )
     
     # Prepare data for batch indexing
-    ids = []
-    documents = []
-    metadatas = []
+    ids = list(metadata.keys())
+    frames = list(metadata.values())
     
-    for frame_id, frame_data in tqdm(metadata.items(), desc="Preparing embeddings"):
-        # Create document to embed - combine all text fields
-        doc_text = []
-        
-        # Add metadata fields that might be relevant
-        if "description" in frame_data:
-            doc_text.append(frame_data["description"])
-        
-        # Add the video filename (without extension) as it might contain relevant keywords
-        video_name = os.path.splitext(frame_data["video_filename"])[0]
-        video_name = video_name.replace("_", " ").replace("-", " ")
-        doc_text.append(f"Video: {video_name}")
-        
-        # Add specific context about Ember and phone usage
-        doc_text.append("Ember character")
-        doc_text.append("Frame from Ember video")
-        doc_text.append("Scene from Ember video")
-        
-        # Add general context about the frame
-        doc_text.append("Frame from video content")
-        doc_text.append("Scene from video")
-        
-        # Join all text elements
-        document = " ".join(doc_text)
-        
-        # Skip if document is empty
-        if not document.strip():
-            continue
-        
-        # Add to batch
-        ids.append(frame_id)
-        documents.append(document)
-        
-        # Add relevant metadata for filtering
-        metadatas.append({
+    # Everything after the description depends only on the video, so build it once per video:
+    # the video filename (without extension) might contain relevant keywords, followed by
+    # specific context about Ember and general context about the frame
+    to_spaces = str.maketrans({"_": " ", "-": " "})
+    context_by_video = {
+        video_filename: (
+            f"Video: {os.path.splitext(video_filename)[0].translate(to_spaces)} "
+            "Ember character Frame from Ember video Scene from Ember video "
+            "Frame from video content Scene from video"
+        )
+        for video_filename in {frame_data["video_filename"] for frame_data in frames}
+    }
+    
+    # Create documents to embed - the CLIP description (if any) followed by the video context
+    documents = [
+        f"{frame_data['description']} {context_by_video[frame_data['video_filename']]}"
+        if "description" in frame_data
+        else context_by_video[frame_data["video_filename"]]
+        for frame_data in frames
+    ]
+    
+    # Add relevant metadata for filtering
+    metadatas = [
+        {
             "video_filename": frame_data["video_filename"],
             "frame_number": frame_data["frame_number"],
             "timestamp": frame_data["timestamp"]
-        })
+        }
+        for frame_data in frames
+    ]
     
     # Check if we have data to index
     if not ids:
         print("No frames to index!")
         return
     
-    # Add items to collection in batches
-    batch_size = 100
+    # Compute embeddings up front, reusing cached vectors for unchanged documents
+    embeddings = embed_documents(documents, model)
+    
+    # Upsert items in large batches so re-runs overwrite existing frames
+    # instead of requiring --recreate
+    batch_size = 512
     for i in range(0, len(ids), batch_size):
         batch_end = min(i + batch_size, len(ids))
-        collection.add(
+        collection.upsert(
             ids=ids[i:batch_end],
             documents=documents[i:batch_end],
+            embeddings=embeddings[i:batch_end].tolist(),
             metadatas=metadatas[i:batch_end]
         )
         print(f"Indexed batch {i//batch_size + 1}/{(len(ids)-1)//batch_size + 1}")
     
+    # Remove frames that are no longer in the metadata (deleted videos, deduplicated frames)
+    current_ids = set(ids)
+    stale_ids = [frame_id for frame_id in collection.get(include=[])["ids"] if frame_id not in current_ids]
+    for i in range(0, len(stale_ids), batch_size):
+        collection.delete(ids=stale_ids[i:i + batch_size])
+    if stale_ids:
+        print(f"Removed {len(stale_ids)} stale frames from ChromaDB")
+    
     print(f"Indexed {len(ids)} frames in ChromaDB")
     
+    # Build the compressed FAISS index served by the API when configured
+    if settings.SEARCH_BACKEND == "faiss":
+        faiss_index = FaissFrameIndex.build(embeddings, ids)
+        faiss_index.save()
+        print(f"Built FAISS index with {len(ids)} frames at {settings.FAISS_INDEX_PATH}")
+    
     # Test a query
     if args.test:
         test_query(collection)
@@ -158,8 +241,7 @@ def main():
         # Load existing metadata
         metadata_path = os.path.join(settings.FRAMES_DIR, "metadata.json")
         if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
+            metadata = orjson.loads(Path(metadata_path).read_bytes())
             print(f"Loaded metadata for {len(metadata)} frames")
         else:
             print("No metadata found. Run without --skip-extraction first")
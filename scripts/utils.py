@@ -2,16 +2,21 @@
 import os
 import shutil
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+COPY_BUFFER_SIZE = 1024 * 1024
 
-def extract_sample_data(zip_path, output_dir):
+
+def extract_sample_data(zip_path, output_dir, max_workers=None):
     """
     Extract the sample data zip file to the videos directory
     
     Args:
         zip_path: Path to the sample data zip file
         output_dir: Directory to extract videos to
+        max_workers: Number of videos to extract in parallel (default: ThreadPoolExecutor's)
     """
     # Check if zip file exists
     if not os.path.exists(zip_path):
@@ -20,23 +25,36 @@ def extract_sample_data(zip_path, output_dir):
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Extract zip file
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(output_dir)
+        # Videos are written straight into output_dir, flattening any nested directories;
+        # as before, a later entry with the same file name replaces an earlier one
+        videos = {}
+        other_members = []
+        for info in zip_ref.infolist():
+            file_name = os.path.basename(info.filename)
+            if not info.is_dir() and file_name.endswith(VIDEO_EXTENSIONS):
+                videos[file_name] = info
+            else:
+                other_members.append(info)
+        
+        # Everything else keeps its layout from the archive
+        zip_ref.extractall(output_dir, members=other_members)
+        
+        def extract_video(file_name, info):
+            target_path = os.path.join(output_dir, file_name)
+            # A ZipFile's shared file handle is not safe to read from several threads,
+            # so each task opens the archive itself
+            with zipfile.ZipFile(zip_path, 'r') as task_zip, \
+                    task_zip.open(info) as source, open(target_path, 'wb') as target:
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            return file_name
+        
+        # zlib releases the GIL, so videos decompress and write in parallel
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for file_name in executor.map(extract_video, videos.keys(), videos.values()):
+                print(f"Extracted {file_name} to {output_dir}")
     
     print(f"Extracted sample data to {output_dir}")
-    
-    # Move any videos from nested directories to the videos directory
-    for root, dirs, files in os.walk(output_dir):
-        for file in files:
-            if file.endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                source_path = os.path.join(root, file)
-                target_path = os.path.join(output_dir, file)
-                
-                # Only move if source and target are different
-                if source_path != target_path:
-                    shutil.move(source_path, target_path)
-                    print(f"Moved {file} to {output_dir}")
 
 
 def clean_data_directories(frames_dir=None, chroma_dir=None):